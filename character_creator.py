@@ -1,25 +1,35 @@
 # character_creator.py
 
 import os
+import sys
 import json
 import argparse
 from typing import Dict, Optional
 from dotenv import load_dotenv
-from src.character_generator import generate_character
-from src.utils import validate_input
+from src.character_generator import CharacterGenerator
+from src.utils import ensure_directory, validate_input, write_json
 
 # Constants
-VALID_RACES = ["Dragonborn", "Dwarf", "Elf", "Gnome", "Half-Elf", "Half-Orc", "Halfling", "Human", "Tiefling"]
-VALID_CLASSES = ["Barbarian", "Bard", "Cleric", "Druid", "Fighter", "Monk", "Paladin", "Ranger", "Rogue", "Sorcerer", "Warlock", "Wizard"]
-VALID_ALIGNMENTS = ["Lawful Good", "Neutral Good", "Chaotic Good", "Lawful Neutral", "True Neutral", 
-                    "Chaotic Neutral", "Lawful Evil", "Neutral Evil", "Chaotic Evil"]
-VALID_BACKSTORY_DEPTHS = ["brief", "moderate", "detailed"]
-
-def get_user_input(prompt: str, valid_options: list, error_message: str) -> str:
+VALID_RACES = ("Dragonborn", "Dwarf", "Elf", "Gnome", "Half-Elf", "Half-Orc", "Halfling", "Human", "Tiefling")
+VALID_CLASSES = ("Barbarian", "Bard", "Cleric", "Druid", "Fighter", "Monk", "Paladin", "Ranger", "Rogue", "Sorcerer", "Warlock", "Wizard")
+VALID_ALIGNMENTS = ("Lawful Good", "Neutral Good", "Chaotic Good", "Lawful Neutral", "True Neutral", 
+                    "Chaotic Neutral", "Lawful Evil", "Neutral Evil", "Chaotic Evil")
+VALID_BACKSTORY_DEPTHS = ("brief", "moderate", "detailed")
+
+# Sets for O(1) membership tests; the tuples above keep display order for argparse and prompts
+_RACES_SET = frozenset(VALID_RACES)
+_CLASSES_SET = frozenset(VALID_CLASSES)
+_ALIGNMENTS_SET = frozenset(VALID_ALIGNMENTS)
+_BACKSTORY_DEPTHS_SET = frozenset(VALID_BACKSTORY_DEPTHS)
+
+def get_user_input(prompt: str, valid_options: tuple, error_message: str,
+                   valid_options_set: Optional[frozenset] = None) -> str:
     """Get and validate user input against a list of valid options."""
+    if valid_options_set is None:
+        valid_options_set = frozenset(valid_options)
     while True:
         user_input = input(prompt).strip().title()
-        if user_input in valid_options:
+        if user_input in valid_options_set:
             return user_input
         print(f"Error: {error_message}")
         print(f"Valid options: {', '.join(valid_options)}")
@@ -30,13 +40,11 @@ def save_character(character: Dict, filename: Optional[str] = None) -> str:
         filename = f"{character['name'].lower().replace(' ', '_')}"
     
     # Ensure the data directory exists
-    os.makedirs("data/characters", exist_ok=True)
+    ensure_directory("data/characters")
     filepath = f"data/characters/{filename}.json"
     
     try:
-        with open(filepath, "w") as f:
-            json.dump(character, f, indent=4)
-        return filepath
+        return write_json(filepath, character)
     except IOError as e:
         raise IOError(f"Failed to save character: {e}")
 
@@ -69,30 +77,39 @@ def main():
         race = args.race or get_user_input(
             "Enter character race: ",
             VALID_RACES,
-            "Invalid race selected."
+            "Invalid race selected.",
+            _RACES_SET
         )
 
         class_type = args.class_type or get_user_input(
             "Enter character class: ",
             VALID_CLASSES,
-            "Invalid class selected."
+            "Invalid class selected.",
+            _CLASSES_SET
         )
 
         alignment = args.alignment or get_user_input(
             "Enter character alignment: ",
             VALID_ALIGNMENTS,
-            "Invalid alignment selected."
+            "Invalid alignment selected.",
+            _ALIGNMENTS_SET
         )
 
         backstory_depth = args.backstory or get_user_input(
             "Enter backstory depth (brief/moderate/detailed): ",
             VALID_BACKSTORY_DEPTHS,
-            "Invalid backstory depth selected."
+            "Invalid backstory depth selected.",
+            _BACKSTORY_DEPTHS_SET
         )
 
-        # Generate character
+        # Generate character, echoing the response as it streams in when interactive
         print("\nGenerating character...")
-        character = generate_character(race, class_type, alignment, backstory_depth)
+        on_token = None
+        if sys.stdout.isatty():
+            on_token = lambda token: print(token, end="", flush=True)
+        generator = CharacterGenerator()
+        character = generator.generate_character(race, class_type, alignment, backstory_depth,
+                                                 on_token=on_token)
 
         # Display character
         print("\nGenerated Character:")
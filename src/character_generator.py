@@ -1,62 +1,352 @@
 import os
 import json
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List, Optional
+import random
+import weakref
+from collections import OrderedDict
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import diskcache
+import httpx
 import openai
+import tenacity
 from .utils import validate_input
 
+# Prefer orjson for parsing responses, falling back to the standard library
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Decoder used to find JSON embedded in surrounding text
+_decoder = json.JSONDecoder()
+
+def _loads_lenient(text: str, expected: type = dict):
+    """
+    Parse a model response, tolerating prose or markdown fences around the JSON.
+    
+    When the whole text isn't JSON, the first embedded JSON object (or array, if
+    expected is list) that decodes is returned. If none does, the error from
+    parsing the whole text is raised.
+    """
+    try:
+        return _json.loads(text)
+    except json.JSONDecodeError as e:  # orjson.JSONDecodeError subclasses it
+        error = e
+    
+    # Fall back to scanning for a value of the expected type, skipping openers that don't decode
+    opener = "[" if expected is list else "{"
+    start = text.find(opener)
+    while start != -1:
+        try:
+            return _decoder.raw_decode(text, start)[0]
+        except json.JSONDecodeError:
+            start = text.find(opener, start + 1)
+    raise error
+
+# Prompt templates for each generated section
+PROMPTS = {
+    "basic_info": "Generate a D&D character with race: {race}, class: {class}, alignment: {alignment}...",
+    "background": "Create a {depth} backstory for a D&D character...",
+    "equipment": "List appropriate equipment for a level {level} {class}...",
+    "features": "List features for a level {level} {race} {class}...",
+    "spells": "Generate appropriate spells for a level {level} {class}..."
+}
+
+# Classes that get a spell list
+_SPELLCASTERS = frozenset({"Wizard", "Cleric", "Bard", "Druid", "Sorcerer", "Warlock", "Paladin", "Ranger"})
+
+# Models that reject response_format={"type": "json_object"}; _loads_lenient parses their free-form replies
+_NO_JSON_MODE_MODELS = frozenset({
+    "gpt-4", "gpt-4-0314", "gpt-4-0613", "gpt-4-32k", "gpt-4-32k-0314", "gpt-4-32k-0613",
+    "gpt-3.5-turbo-0301", "gpt-3.5-turbo-0613", "gpt-3.5-turbo-16k", "gpt-3.5-turbo-16k-0613"
+})
+
+# Connection pool limits for the shared API client
+_MAX_CONNECTIONS = 32
+
+# API clients by event loop and API key, and the event loop the sync wrappers run on.
+# Async clients are bound to the loop they were first used on, so each loop gets its own;
+# keeping the sync wrappers' loop alive lets pooled keep-alive connections be reused across calls.
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, openai.AsyncOpenAI]]" = \
+    weakref.WeakKeyDictionary()
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+def _get_client(api_key: str) -> openai.AsyncOpenAI:
+    """Return the HTTP/2, connection-pooling API client for an API key on the running event loop."""
+    clients = _CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(api_key)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            max_retries=0,  # retries are handled by CharacterGenerator._stream_completion
+            http_client=openai.DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=_MAX_CONNECTIONS,
+                                    max_keepalive_connections=_MAX_CONNECTIONS)
+            )
+        )
+        clients[api_key] = client
+    return client
+
+# Transient API errors worth retrying, and the backoff used between attempts
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError
+)
+_backoff = tenacity.wait_exponential_jitter(initial=1, max=30)
+
+def _is_transient(error: Optional[BaseException]) -> bool:
+    """Determine if an error was ultimately caused by a transient API error."""
+    while error is not None:
+        if isinstance(error, _RETRYABLE_ERRORS):
+            return True
+        error = error.__cause__
+    return False
+
+def _retry_wait(retry_state: tenacity.RetryCallState) -> float:
+    """Wait as long as a rate limit's Retry-After header asks, else back off with jitter."""
+    error = retry_state.outcome.exception()
+    if isinstance(error, openai.RateLimitError):
+        try:
+            return float(error.response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            pass
+    return _backoff(retry_state)
+
+def _run(coroutine):
+    """Run a coroutine to completion on the shared event loop."""
+    global _LOOP
+    if _LOOP is None or _LOOP.is_closed():
+        _LOOP = asyncio.new_event_loop()
+    return _LOOP.run_until_complete(coroutine)
+
 class CharacterGenerationError(Exception):
     """Custom exception for character generation errors."""
     pass
 
+class CompletionCache:
+    """LRU cache of API completions keyed by prompt hash, backed by an on-disk store."""
+    
+    def __init__(self, directory: Optional[str] = None, maxsize: int = 4096):
+        """Initialize the in-memory LRU and, if a directory is given, the disk store."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._disk = diskcache.Cache(directory) if directory else None
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Build a cache key from everything that influences a completion."""
+        return hashlib.blake2b(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached completion, or None on a miss."""
+        value = self._memory.get(key)
+        if value is None and self._disk is not None:
+            value = self._disk.get(key)
+        
+        if value is None:
+            self.misses += 1
+            logger.debug(f"Completion cache miss (hits={self.hits}, misses={self.misses})")
+            return None
+        
+        self.hits += 1
+        logger.debug(f"Completion cache hit (hits={self.hits}, misses={self.misses})")
+        self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store a completion in memory and on disk."""
+        self._remember(key, value)
+        if self._disk is not None:
+            self._disk.set(key, value)
+
+    def delete(self, key: str) -> None:
+        """Remove a completion from memory and disk."""
+        self._memory.pop(key, None)
+        if self._disk is not None:
+            self._disk.delete(key)
+
+    def _remember(self, key: str, value: str) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entry when full."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
 class CharacterGenerator:
     """Handles D&D character generation using OpenAI's API."""
     
     # Class constants
-    VALID_RACES = ["Dragonborn", "Dwarf", "Elf", "Gnome", "Half-Elf", "Half-Orc", "Halfling", "Human", "Tiefling"]
-    VALID_CLASSES = ["Barbarian", "Bard", "Cleric", "Druid", "Fighter", "Monk", "Paladin", "Ranger", "Rogue", "Sorcerer", "Warlock", "Wizard"]
-    VALID_ALIGNMENTS = ["Lawful Good", "Neutral Good", "Chaotic Good", "Lawful Neutral", "True Neutral", "Chaotic Neutral", "Lawful Evil", "Neutral Evil", "Chaotic Evil"]
+    VALID_RACES = ("Dragonborn", "Dwarf", "Elf", "Gnome", "Half-Elf", "Half-Orc", "Halfling", "Human", "Tiefling")
+    VALID_CLASSES = ("Barbarian", "Bard", "Cleric", "Druid", "Fighter", "Monk", "Paladin", "Ranger", "Rogue", "Sorcerer", "Warlock", "Wizard")
+    VALID_ALIGNMENTS = ("Lawful Good", "Neutral Good", "Chaotic Good", "Lawful Neutral", "True Neutral", "Chaotic Neutral", "Lawful Evil", "Neutral Evil", "Chaotic Evil")
+    STAT_NAMES = ("strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma")
+    
+    # Ability scores ordered from most to least important for each class
+    CLASS_STAT_PRIORITIES = {
+        "Barbarian": ("strength", "constitution", "dexterity", "wisdom", "charisma", "intelligence"),
+        "Bard": ("charisma", "dexterity", "constitution", "wisdom", "intelligence", "strength"),
+        "Cleric": ("wisdom", "constitution", "strength", "dexterity", "charisma", "intelligence"),
+        "Druid": ("wisdom", "constitution", "dexterity", "intelligence", "charisma", "strength"),
+        "Fighter": ("strength", "constitution", "dexterity", "wisdom", "charisma", "intelligence"),
+        "Monk": ("dexterity", "wisdom", "constitution", "strength", "intelligence", "charisma"),
+        "Paladin": ("strength", "charisma", "constitution", "wisdom", "dexterity", "intelligence"),
+        "Ranger": ("dexterity", "wisdom", "constitution", "strength", "intelligence", "charisma"),
+        "Rogue": ("dexterity", "constitution", "wisdom", "charisma", "intelligence", "strength"),
+        "Sorcerer": ("charisma", "constitution", "dexterity", "wisdom", "intelligence", "strength"),
+        "Warlock": ("charisma", "constitution", "dexterity", "wisdom", "intelligence", "strength"),
+        "Wizard": ("intelligence", "constitution", "dexterity", "wisdom", "charisma", "strength")
+    }
+    
+    # JSON shape of each section in a combined response
+    SECTION_SHAPES = {
+        "basic_info": "{...}",
+        "background": "{...}",
+        "equipment": "[...]",
+        "features": "{...}",
+        "spells": "{...}"
+    }
+    
+    # Keys every spec passed to generate_characters must have
+    SPEC_KEYS = ("race", "class_type", "alignment")
+    
+    # Attempts per character, and initial backoff in seconds, for batch generation
+    BATCH_ATTEMPTS = 3
+    BATCH_RETRY_DELAY = 1.0
     
     def __init__(self):
         """Initialize the character generator with API configuration."""
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.model = os.getenv("OPENAI_MODEL", "gpt-4")
         self.max_tokens = int(os.getenv("OPENAI_MAX_TOKENS", "2000"))
+        self.temperature = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
+        self.max_concurrency = int(os.getenv("OPENAI_CONCURRENCY", "16"))
+        self.batch_sections = os.getenv("OPENAI_BATCH_SECTIONS", "true").lower() == "true"
         
         if not self.api_key:
             raise ValueError("OpenAI API key not found in environment variables")
         
-        openai.api_key = self.api_key
+        # Concurrency limits by event loop, since a semaphore is bound to the loop that uses it
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        
+        # Cached completions replay the same character, so by default only deterministic
+        # (temperature 0) requests are cached; set OPENAI_CACHE to force it on or off
+        cache_default = "true" if self.temperature == 0 else "false"
+        self._cache = None
+        if os.getenv("OPENAI_CACHE", cache_default).lower() == "true":
+            self._cache = CompletionCache(os.getenv("OPENAI_CACHE_DIR", "data/.llm_cache"))
 
     def generate_character(self, race: str, class_type: str, alignment: str, 
-                         backstory_depth: str = "moderate", level: int = 1) -> Dict:
+                         backstory_depth: str = "moderate", level: int = 1,
+                         on_token: Optional[Callable[[str], None]] = None) -> Dict:
         """Generate a complete D&D character with all necessary attributes."""
+        return _run(self.agenerate_character(race, class_type, alignment, backstory_depth, level, on_token))
+
+    async def agenerate_character(self, race: str, class_type: str, alignment: str,
+                                  backstory_depth: str = "moderate", level: int = 1,
+                                  on_token: Optional[Callable[[str], None]] = None) -> Dict:
+        """
+        Asynchronously generate a complete D&D character.
+        
+        If given, on_token is called with each chunk of the response text as it
+        streams in. Only the batched single-request mode streams, since
+        concurrent per-section responses would interleave.
+        """
         try:
             # Validate inputs
             self._validate_inputs(race, class_type, alignment, level)
             
-            # Generate character components
+            # Validation is case-insensitive, but the class lookups below are not
+            race, class_type, alignment = race.strip().title(), class_type.strip().title(), alignment.strip().title()
+            is_caster = self._is_spellcaster(class_type)
+            
+            # Generate AI-written sections in one request, or one concurrent request per section
+            if self.batch_sections:
+                sections = await self._generate_all(race, class_type, alignment, backstory_depth, level,
+                                                    is_caster, on_token)
+            else:
+                sections = await self._generate_sections(race, class_type, alignment, backstory_depth, level,
+                                                         is_caster)
+            
+            # Assemble character components
             character = {
-                "basic_info": self._generate_basic_info(race, class_type, alignment),
+                "basic_info": sections["basic_info"],
                 "stats": self._generate_stats(class_type),
-                "background": self._generate_background(backstory_depth),
-                "equipment": self._generate_equipment(class_type, level),
-                "features": self._generate_features(race, class_type, level)
+                "background": sections["background"],
+                "equipment": sections["equipment"],
+                "features": sections["features"]
             }
             
             # Add spells if character is a spellcaster
-            if self._is_spellcaster(class_type):
-                character["spells"] = self._generate_spells(class_type, level)
+            if is_caster:
+                character["spells"] = sections["spells"]
             
             return self._format_character(character)
             
         except Exception as e:
             logger.error(f"Error generating character: {str(e)}")
-            raise CharacterGenerationError(f"Failed to generate character: {str(e)}")
+            raise CharacterGenerationError(f"Failed to generate character: {str(e)}") from e
+
+    def generate_characters(self, specs: List[Dict],
+                            return_exceptions: bool = False) -> List[Union[Dict, Exception]]:
+        """Generate one character per spec concurrently, returned in the order given."""
+        return _run(self.agenerate_characters(specs, return_exceptions))
+
+    async def agenerate_characters(self, specs: List[Dict],
+                                   return_exceptions: bool = False) -> List[Union[Dict, Exception]]:
+        """
+        Asynchronously generate one character per spec, returned in the order given.
+        
+        Each spec holds keyword arguments for agenerate_character. All specs are
+        validated before any API work starts, requests share the generator's
+        concurrency limit, and characters that failed on a transient API error are
+        retried with exponential backoff. Characters that still fail raise, or with
+        return_exceptions are returned in place as their CharacterGenerationError.
+        """
+        for i, spec in enumerate(specs):
+            missing = [key for key in self.SPEC_KEYS if key not in spec]
+            if missing:
+                raise ValueError(f"Spec {i} is missing required keys: {', '.join(missing)}")
+            self._validate_inputs(spec["race"], spec["class_type"], spec["alignment"], spec.get("level", 1))
+        
+        results = await asyncio.gather(
+            *(self.agenerate_character(**spec) for spec in specs), return_exceptions=True
+        )
+        
+        for attempt in range(1, self.BATCH_ATTEMPTS):
+            # Permanent failures (bad requests, unparseable responses) would fail again
+            failed = [i for i, result in enumerate(results)
+                      if isinstance(result, CharacterGenerationError) and _is_transient(result)]
+            if not failed:
+                break
+            
+            delay = self.BATCH_RETRY_DELAY * 2 ** (attempt - 1)
+            logger.warning(f"Retrying {len(failed)} failed character(s) in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            
+            retried = await asyncio.gather(
+                *(self.agenerate_character(**specs[i]) for i in failed), return_exceptions=True
+            )
+            for i, result in zip(failed, retried):
+                results[i] = result
+        
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+        return results
 
     def _validate_inputs(self, race: str, class_type: str, alignment: str, level: int) -> None:
         """Validate all input parameters."""
@@ -69,91 +359,245 @@ class CharacterGenerator:
         if not 1 <= level <= 20:
             raise ValueError("Level must be between 1 and 20")
 
-    def _generate_basic_info(self, race: str, class_type: str, alignment: str) -> Dict:
+    async def _generate_all(self, race: str, class_type: str, alignment: str,
+                            backstory_depth: str, level: int, is_caster: bool,
+                            on_token: Optional[Callable[[str], None]] = None) -> Dict:
+        """Generate every AI-written character section with a single API call."""
+        sections = ("basic_info", "background", "equipment", "features")
+        if is_caster:
+            sections += ("spells",)
+        
+        system_prompt, prompt = self._create_combined_prompt(sections, (
+            ("race", race),
+            ("class", class_type),
+            ("alignment", alignment),
+            ("depth", backstory_depth),
+            ("level", level)
+        ))
+        
+        def parse(response: str) -> Dict:
+            """Parse the combined response, rejecting one that lacks a requested section."""
+            result = _loads_lenient(response)
+            missing = [section for section in sections if section not in result]
+            if missing:
+                raise CharacterGenerationError(f"Response missing sections: {', '.join(missing)}")
+            return result
+        
+        return await self._acall_openai_api(prompt, system_prompt=system_prompt, json_response=True,
+                                            on_token=on_token, parse=parse)
+
+    async def _generate_sections(self, race: str, class_type: str, alignment: str,
+                                 backstory_depth: str, level: int, is_caster: bool) -> Dict:
+        """Generate each AI-written character section with its own concurrent API call."""
+        requests = {
+            "basic_info": self._generate_basic_info(race, class_type, alignment),
+            "background": self._generate_background(backstory_depth),
+            "equipment": self._generate_equipment(class_type, level),
+            "features": self._generate_features(race, class_type, level)
+        }
+        if is_caster:
+            requests["spells"] = self._generate_spells(class_type, level, is_caster)
+        
+        results = await asyncio.gather(*requests.values())
+        return dict(zip(requests.keys(), results))
+
+    async def _generate_basic_info(self, race: str, class_type: str, alignment: str) -> Dict:
         """Generate basic character information including name and personality."""
-        prompt = self._create_prompt("basic_info", {
-            "race": race,
-            "class": class_type,
-            "alignment": alignment
-        })
+        prompt = self._create_prompt("basic_info", (
+            ("race", race),
+            ("class", class_type),
+            ("alignment", alignment)
+        ))
         
-        response = self._call_openai_api(prompt)
-        return json.loads(response)
+        return await self._acall_openai_api(prompt)
 
     def _generate_stats(self, class_type: str) -> Dict:
         """Generate appropriate ability scores based on class."""
-        base_stats = self._roll_stats()
+        base_stats = self._roll_stats()[0]
         optimized_stats = self._optimize_stats_for_class(base_stats, class_type)
         return optimized_stats
 
-    def _generate_background(self, depth: str) -> Dict:
+    def bulk_generate_stats(self, class_type: str, n: int) -> List[Dict]:
+        """Generate ability scores for n characters of the same class."""
+        class_type = class_type.strip().title()
+        return [self._optimize_stats_for_class(stats, class_type) for stats in self._roll_stats(n)]
+
+    @classmethod
+    def _roll_stats(cls, n: int = 1) -> List[Dict]:
+        """Roll 4d6-drop-lowest for each ability of n characters, drawing all dice at once."""
+        rolls = random.choices(range(1, 7), k=n * len(cls.STAT_NAMES) * 4)
+        totals = [sum(dice) - min(dice) for dice in zip(*[iter(rolls)] * 4)]
+        stat_count = len(cls.STAT_NAMES)
+        return [dict(zip(cls.STAT_NAMES, totals[i:i + stat_count]))
+                for i in range(0, len(totals), stat_count)]
+
+    @classmethod
+    def _optimize_stats_for_class(cls, stats: Dict, class_type: str) -> Dict:
+        """Assign the highest rolled scores to the abilities the class relies on most."""
+        priorities = cls.CLASS_STAT_PRIORITIES.get(class_type, cls.STAT_NAMES)
+        assigned = dict(zip(priorities, sorted(stats.values(), reverse=True)))
+        return {stat: assigned[stat] for stat in cls.STAT_NAMES}
+
+    async def _generate_background(self, depth: str) -> Dict:
         """Generate character background and personality traits."""
-        prompt = self._create_prompt("background", {"depth": depth})
-        response = self._call_openai_api(prompt)
-        return json.loads(response)
+        prompt = self._create_prompt("background", (("depth", depth),))
+        return await self._acall_openai_api(prompt)
 
-    def _generate_equipment(self, class_type: str, level: int) -> List:
+    async def _generate_equipment(self, class_type: str, level: int) -> List:
         """Generate appropriate equipment based on class and level."""
-        prompt = self._create_prompt("equipment", {
-            "class": class_type,
-            "level": level
-        })
-        response = self._call_openai_api(prompt)
-        return json.loads(response)
-
-    def _generate_features(self, race: str, class_type: str, level: int) -> Dict:
+        prompt = self._create_prompt("equipment", (
+            ("class", class_type),
+            ("level", level)
+        ))
+        return await self._acall_openai_api(prompt, parse=partial(_loads_lenient, expected=list))
+
+    async def _generate_features(self, race: str, class_type: str, level: int) -> Dict:
         """Generate racial and class features."""
-        prompt = self._create_prompt("features", {
-            "race": race,
-            "class": class_type,
-            "level": level
-        })
-        response = self._call_openai_api(prompt)
-        return json.loads(response)
-
-    def _generate_spells(self, class_type: str, level: int) -> Optional[Dict]:
-        """Generate spell list for spellcasting classes."""
-        if not self._is_spellcaster(class_type):
-            return None
-            
-        prompt = self._create_prompt("spells", {
-            "class": class_type,
-            "level": level
-        })
-        response = self._call_openai_api(prompt)
-        return json.loads(response)
-
-    def _call_openai_api(self, prompt: str) -> str:
-        """Make API call to OpenAI."""
+        prompt = self._create_prompt("features", (
+            ("race", race),
+            ("class", class_type),
+            ("level", level)
+        ))
+        return await self._acall_openai_api(prompt)
+
+    async def _generate_spells(self, class_type: str, level: int,
+                               is_caster: Optional[bool] = None) -> Dict:
+        """Generate spell list for spellcasting classes, or an empty one without an API call."""
+        if is_caster is None:
+            is_caster = self._is_spellcaster(class_type)
+        if not is_caster:
+            return {}
+        
+        prompt = self._create_prompt("spells", (
+            ("class", class_type),
+            ("level", level)
+        ))
+        return await self._acall_openai_api(prompt)
+
+    async def _acall_openai_api(self, prompt: str, system_prompt: Optional[str] = None,
+                                json_response: bool = False,
+                                on_token: Optional[Callable[[str], None]] = None,
+                                parse: Callable[[str], Any] = _loads_lenient) -> Any:
+        """
+        Make a streaming API call to OpenAI, bounded by the generator's concurrency limit.
+        
+        The response is returned as parsed by parse. Completions are only cached once
+        they parse, so a malformed reply is sampled again on the next call, not replayed.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        
+        options = {}
+        if json_response and self.model not in _NO_JSON_MODE_MODELS:
+            options["response_format"] = {"type": "json_object"}
+        
+        cache_key = None
+        if self._cache is not None:
+            cache_key = self._cache.make_key(self.model, self.max_tokens, self.temperature, messages, options)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                try:
+                    result = parse(cached)
+                except (ValueError, CharacterGenerationError):
+                    # Evict entries that no longer parse, e.g. ones cached before this check existed
+                    self._cache.delete(cache_key)
+                else:
+                    if on_token:
+                        on_token(cached)
+                    return result
+        
         try:
-            response = openai.ChatCompletion.create(
+            content, finish_reason = await self._stream_completion(messages, options, on_token)
+        except openai.OpenAIError as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            raise CharacterGenerationError(f"API error: {str(e)}") from e
+        
+        result = parse(content)
+        
+        # Only cache complete responses; truncated output would never parse
+        if cache_key is not None and finish_reason == "stop":
+            self._cache.set(cache_key, content)
+        return result
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return the generator's concurrency limit for the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    @tenacity.retry(
+        wait=_retry_wait,
+        stop=tenacity.stop_after_attempt(6),
+        retry=tenacity.retry_if_exception_type(_RETRYABLE_ERRORS),
+        before_sleep=tenacity.before_sleep_log(logger, logging.WARNING),
+        reraise=True
+    )
+    async def _stream_completion(self, messages: List[Dict], options: Dict,
+                                 on_token: Optional[Callable[[str], None]] = None) -> Tuple[str, Optional[str]]:
+        """
+        Stream one completion, returning its text and finish reason.
+        
+        Transient errors are retried, unless tokens have already been passed to on_token.
+        """
+        chunks = []
+        finish_reason = None
+        async with self._get_semaphore():
+            stream = await _get_client(self.api_key).chat.completions.create(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=messages,
                 max_tokens=self.max_tokens,
-                temperature=0.7
+                temperature=self.temperature,
+                stream=True,
+                **options
             )
-            return response.choices[0].message.content
-        except openai.error.OpenAIError as e:
-            logger.error(f"OpenAI API error: {str(e)}")
-            raise CharacterGenerationError(f"API error: {str(e)}")
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    token = choice.delta.content or ""
+                    if token:
+                        chunks.append(token)
+                        if on_token:
+                            on_token(token)
+                    finish_reason = choice.finish_reason or finish_reason
+            except _RETRYABLE_ERRORS as e:
+                # Tokens already passed to on_token can't be taken back, so don't retry after one
+                if chunks and on_token:
+                    raise CharacterGenerationError(f"Stream interrupted: {str(e)}") from e
+                raise
+            finally:
+                # Return the connection to the pool even when iteration stops early
+                await stream.close()
+        return "".join(chunks), finish_reason
 
     @staticmethod
     def _is_spellcaster(class_type: str) -> bool:
         """Determine if a class is a spellcaster."""
-        return class_type in ["Wizard", "Cleric", "Bard", "Druid", "Sorcerer", "Warlock", "Paladin", "Ranger"]
+        return class_type in _SPELLCASTERS
 
     @staticmethod
-    def _create_prompt(prompt_type: str, params: Dict) -> str:
-        """Create appropriate prompt based on type and parameters."""
-        # Load prompt templates from file or define them here
-        prompts = {
-            "basic_info": "Generate a D&D character with race: {race}, class: {class}, alignment: {alignment}...",
-            "background": "Create a {depth} backstory for a D&D character...",
-            "equipment": "List appropriate equipment for a level {level} {class}...",
-            "features": "List features for a level {level} {race} {class}...",
-            "spells": "Generate appropriate spells for a level {level} {class}..."
-        }
-        return prompts[prompt_type].format(**params)
+    @lru_cache(maxsize=1024)
+    def _create_prompt(prompt_type: str, params: Tuple) -> str:
+        """Create appropriate prompt based on type and (name, value) parameter pairs."""
+        return PROMPTS[prompt_type].format(**dict(params))
+
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def _create_combined_prompt(cls, sections: Tuple[str, ...], params: Tuple) -> Tuple[str, str]:
+        """Create the system and user prompts for generating several sections at once."""
+        shapes = ", ".join(f'"{section}": {cls.SECTION_SHAPES[section]}' for section in sections)
+        system_prompt = (
+            "You are a D&D 5e character designer. Respond with a single JSON object "
+            f"containing exactly these keys: {{{shapes}}}."
+        )
+        prompt = "\n".join(
+            f"{section}: {cls._create_prompt(section, params)}" for section in sections
+        )
+        return system_prompt, prompt
 
     def _format_character(self, character: Dict) -> Dict:
         """Format and validate the final character data."""
@@ -1,10 +1,18 @@
 import os
 import json
-import re
-from typing import Dict, List, Any, Union
+import math
+import operator
+from typing import Dict, List, Any, Set, Union
 from pathlib import Path
 import logging
 from datetime import datetime
+from functools import lru_cache
+
+# Prefer orjson for character files, falling back to the standard library
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
 
 # Configure logging
 logging.basicConfig(
@@ -13,22 +21,55 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Characters that are invalid in filenames, and names reserved on Windows
+_FILENAME_STRIP = str.maketrans('', '', '<>:"/\\|?*')
+_RESERVED_FILENAMES = frozenset({'con', 'prn', 'aux', 'nul', 'com1', 'com2', 'com3', 'com4'})
+
+# Character schema: required fields with their types, and required ability scores
+_REQUIRED_FIELDS = (
+    ('name', str),
+    ('race', str),
+    ('class', str),
+    ('alignment', str),
+    ('stats', dict),
+    ('background', str)
+)
+_REQUIRED_STATS = ('strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma')
+
+# Directories already created by this process
+_ENSURED_DIRS: Set[str] = set()
+
 class CharacterValidationError(Exception):
     """Custom exception for character validation errors."""
     pass
 
+# Bounded because validate_input is public and callers may pass arbitrary option lists
+@lru_cache(maxsize=64)
+def _normalize_options(valid_options: tuple) -> frozenset:
+    """Helper function to build the normalized set of valid options once per option list."""
+    return frozenset(opt.strip().title() for opt in valid_options)
+
+@lru_cache(maxsize=256)
+def _validate_input_cached(value: str, valid_options: tuple) -> bool:
+    """Helper function to memoize validation results per (value, options) pair."""
+    return value.strip().title() in _normalize_options(valid_options)
+
 def validate_input(value: str, valid_options: List[str]) -> bool:
     """
     Validate if an input value is in the list of valid options (case-insensitive).
     
     Args:
         value: The input value to validate
-        valid_options: List of valid options
+        valid_options: List of valid options (pass a tuple to avoid a copy)
     
     Returns:
         bool: True if valid, False otherwise
     """
-    return value.strip().title() in [opt.strip().title() for opt in valid_options]
+    return _validate_input_cached(value, tuple(valid_options))
+
+# Expose the memoization controls like a functools.lru_cache wrapper would
+validate_input.cache_info = _validate_input_cached.cache_info
+validate_input.cache_clear = _validate_input_cached.cache_clear
 
 def validate_character_data(character_data: Dict[str, Any]) -> bool:
     """
@@ -43,31 +84,20 @@ def validate_character_data(character_data: Dict[str, Any]) -> bool:
     Raises:
         CharacterValidationError: If validation fails
     """
-    required_fields = {
-        'name': str,
-        'race': str,
-        'class': str,
-        'alignment': str,
-        'stats': dict,
-        'background': str
-    }
-
     # Check required fields and their types
-    for field, field_type in required_fields.items():
+    for field, field_type in _REQUIRED_FIELDS:
         if field not in character_data:
             raise CharacterValidationError(f"Missing required field: {field}")
         if not isinstance(character_data[field], field_type):
             raise CharacterValidationError(f"Invalid type for {field}: expected {field_type.__name__}")
 
     # Validate stats
-    if 'stats' in character_data:
-        required_stats = ['strength', 'dexterity', 'constitution', 
-                         'intelligence', 'wisdom', 'charisma']
-        for stat in required_stats:
-            if stat not in character_data['stats']:
-                raise CharacterValidationError(f"Missing stat: {stat}")
-            if not (3 <= character_data['stats'][stat] <= 20):
-                raise CharacterValidationError(f"Invalid value for {stat}: must be between 3 and 20")
+    stats = character_data['stats']
+    for stat in _REQUIRED_STATS:
+        if stat not in stats:
+            raise CharacterValidationError(f"Missing stat: {stat}")
+        if not (3 <= stats[stat] <= 20):
+            raise CharacterValidationError(f"Invalid value for {stat}: must be between 3 and 20")
 
     return True
 
@@ -82,15 +112,26 @@ def sanitize_filename(filename: str) -> str:
         str: Sanitized filename
     """
     # Remove invalid characters and convert spaces to underscores
-    sanitized = re.sub(r'[<>:"/\\|?*]', '', filename)
-    sanitized = sanitized.strip().replace(' ', '_').lower()
+    sanitized = filename.translate(_FILENAME_STRIP).strip().replace(' ', '_').lower()
     
     # Ensure the filename isn't empty or a reserved name
-    if not sanitized or sanitized in ['con', 'prn', 'aux', 'nul', 'com1', 'com2', 'com3', 'com4']:
+    if not sanitized or sanitized in _RESERVED_FILENAMES:
         sanitized = f"character_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
     return sanitized
 
+def ensure_directory(directory: Union[str, Path]) -> None:
+    """
+    Create a directory (and parents) unless this process already has.
+    
+    Args:
+        directory: Path of the directory to create
+    """
+    key = str(directory)
+    if key not in _ENSURED_DIRS:
+        os.makedirs(key, exist_ok=True)
+        _ENSURED_DIRS.add(key)
+
 def save_character(character_data: Dict[str, Any], filepath: Union[str, Path]) -> str:
     """
     Save character data to a JSON file.
@@ -111,11 +152,10 @@ def save_character(character_data: Dict[str, Any], filepath: Union[str, Path]) -
         
         # Ensure directory exists
         filepath = Path(filepath)
-        filepath.parent.mkdir(parents=True, exist_ok=True)
+        ensure_directory(filepath.parent)
         
         # Save the file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(character_data, f, indent=4, ensure_ascii=False)
+        write_json(filepath, character_data)
         
         logger.info(f"Character saved successfully to {filepath}")
         return str(filepath)
@@ -124,6 +164,52 @@ def save_character(character_data: Dict[str, Any], filepath: Union[str, Path]) -
         logger.error(f"Error saving character: {str(e)}")
         raise
 
+def write_json(filepath: Union[str, Path], data: Any) -> str:
+    """
+    Write data to a file as indented UTF-8 JSON.
+    
+    Args:
+        filepath: Path of the file to write
+        data: JSON-serializable data
+        
+    Returns:
+        str: Path to the written file
+        
+    Raises:
+        OSError: If file cannot be written
+    """
+    _write_bytes(filepath, _dumps(data))
+    return str(filepath)
+
+def _dumps(data: Any) -> bytes:
+    """Helper function to encode data as indented UTF-8 JSON with the active backend."""
+    if _json is json:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    return _json.dumps(data, option=_json.OPT_INDENT_2)
+
+def _write_bytes(filepath: Union[str, Path], payload: bytes) -> None:
+    """Helper function to write a pre-encoded payload with unbuffered OS-level writes."""
+    # O_BINARY stops Windows from translating newlines; it is 0 elsewhere
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    try:
+        fd = os.open(str(filepath), flags, 0o644)
+    except FileNotFoundError:
+        # Recreate a directory removed since ensure_directory cached it, once; any other
+        # missing parent is an error, as it would be for open()
+        directory = os.path.dirname(str(filepath))
+        if directory not in _ENSURED_DIRS:
+            raise
+        _ENSURED_DIRS.discard(directory)
+        ensure_directory(directory)
+        fd = os.open(str(filepath), flags, 0o644)
+    try:
+        view = memoryview(payload)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
 def load_character(filepath: Union[str, Path]) -> Dict[str, Any]:
     """
     Load character data from a JSON file.
@@ -139,8 +225,8 @@ def load_character(filepath: Union[str, Path]) -> Dict[str, Any]:
         JSONDecodeError: If file is not valid JSON
     """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            character_data = json.load(f)
+        with open(filepath, 'rb') as f:
+            character_data = _json.loads(f.read())
         
         # Validate loaded data
         validate_character_data(character_data)
@@ -166,56 +252,79 @@ def format_character_output(character_data: Dict[str, Any], format_type: str = '
     """
     try:
         validate_character_data(character_data)
-        
-        if format_type == 'markdown':
-            return f"""# {character_data['name']}
-## Basic Information
-- **Race:** {character_data['race']}
-- **Class:** {character_data['class']}
-- **Alignment:** {character_data['alignment']}
-
-## Stats
-{_format_stats_markdown(character_data['stats'])}
-
-## Background
-{character_data['background']}
-"""
-        elif format_type == 'html':
-            return f"""<h1>{character_data['name']}</h1>
-<h2>Basic Information</h2>
-<ul>
-    <li><strong>Race:</strong> {character_data['race']}</li>
-    <li><strong>Class:</strong> {character_data['class']}</li>
-    <li><strong>Alignment:</strong> {character_data['alignment']}</li>
-</ul>
-<h2>Background</h2>
-<p>{character_data['background']}</p>
-"""
-        else:  # default to text
-            return f"""Character Name: {character_data['name']}
-Race: {character_data['race']}
-Class: {character_data['class']}
-Alignment: {character_data['alignment']}
-
-Stats:
-{_format_stats_text(character_data['stats'])}
-
-Background:
-{character_data['background']}
-"""
+        formatter = _FORMATTERS.get(format_type, _format_text)  # default to text
+        return formatter(character_data)
     except Exception as e:
         logger.error(f"Error formatting character output: {str(e)}")
         raise
 
-def _format_stats_text(stats: Dict[str, int]) -> str:
-    """Helper function to format stats in text format."""
-    return '\n'.join(f"{stat.title()}: {value}" for stat, value in stats.items())
+def _format_text(character_data: Dict[str, Any]) -> str:
+    """Helper function to format a character in text format."""
+    parts = [
+        f"Character Name: {character_data['name']}",
+        f"Race: {character_data['race']}",
+        f"Class: {character_data['class']}",
+        f"Alignment: {character_data['alignment']}",
+        "",
+        "Stats:"
+    ]
+    _format_stats_text(character_data['stats'], parts)
+    parts.extend(("", "Background:", character_data['background'], ""))
+    return '\n'.join(parts)
+
+def _format_markdown(character_data: Dict[str, Any]) -> str:
+    """Helper function to format a character in markdown format."""
+    parts = [
+        f"# {character_data['name']}",
+        "## Basic Information",
+        f"- **Race:** {character_data['race']}",
+        f"- **Class:** {character_data['class']}",
+        f"- **Alignment:** {character_data['alignment']}",
+        "",
+        "## Stats"
+    ]
+    _format_stats_markdown(character_data['stats'], parts)
+    parts.extend(("", "## Background", character_data['background'], ""))
+    return '\n'.join(parts)
+
+def _format_html(character_data: Dict[str, Any]) -> str:
+    """Helper function to format a character in html format."""
+    return '\n'.join((
+        f"<h1>{character_data['name']}</h1>",
+        "<h2>Basic Information</h2>",
+        "<ul>",
+        f"    <li><strong>Race:</strong> {character_data['race']}</li>",
+        f"    <li><strong>Class:</strong> {character_data['class']}</li>",
+        f"    <li><strong>Alignment:</strong> {character_data['alignment']}</li>",
+        "</ul>",
+        "<h2>Background</h2>",
+        f"<p>{character_data['background']}</p>",
+        ""
+    ))
 
-def _format_stats_markdown(stats: Dict[str, int]) -> str:
-    """Helper function to format stats in markdown format."""
-    return '\n'.join(f"- **{stat.title()}:** {value}" for stat, value in stats.items())
+def _format_stats_text(stats: Dict[str, int], out: List[str]) -> None:
+    """Helper function to append stats in text format to a list of lines."""
+    out.extend(f"{stat.title()}: {value}" for stat, value in stats.items())
 
-def get_modifier(stat_value: int) -> int:
+def _format_stats_markdown(stats: Dict[str, int], out: List[str]) -> None:
+    """Helper function to append stats in markdown format to a list of lines."""
+    out.extend(f"- **{stat.title()}:** {value}" for stat, value in stats.items())
+
+# Formatter for each supported output format
+_FORMATTERS = {
+    'text': _format_text,
+    'markdown': _format_markdown,
+    'html': _format_html
+}
+
+def _floor_score(value: Union[int, float]) -> int:
+    """Helper function to floor a score to an int, rejecting non-numbers such as strings."""
+    # validate_character_data accepts floats such as 15.0 from loaded files
+    if isinstance(value, float):
+        return math.floor(value)
+    return operator.index(value)
+
+def get_modifier(stat_value: Union[int, float]) -> int:
     """
     Calculate ability modifier from stat value.
     
@@ -225,7 +334,20 @@ def get_modifier(stat_value: int) -> int:
     Returns:
         int: The ability modifier
     """
-    return (stat_value - 10) // 2
+    # Arithmetic right shift floors like // 2, including for negative values
+    return (_floor_score(stat_value) - 10) >> 1
+
+def get_modifiers(stats: Dict[str, Union[int, float]]) -> Dict[str, int]:
+    """
+    Calculate ability modifiers for every stat at once.
+    
+    Args:
+        stats: Mapping of ability names to scores
+        
+    Returns:
+        dict: Mapping of ability names to modifiers
+    """
+    return {stat: (_floor_score(value) - 10) >> 1 for stat, value in stats.items()}
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,287 @@
+"""Test suite for CharacterGenerator internals, run against a fake streaming API client."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import src.character_generator as character_generator
+from src.character_generator import CharacterGenerationError, CharacterGenerator, CompletionCache, _loads_lenient
+
+CHARACTER_SECTIONS = '{"basic_info": {}, "background": {}, "equipment": [], "features": {}}'
+
+def _chunk(content, finish_reason=None):
+    """Build a streamed completion chunk."""
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+class FakeStream:
+    """Stand-in for an AsyncStream that yields tokens, raising any exception found in place of one."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.closed = False
+
+    async def __aiter__(self):
+        for token in self.tokens:
+            if isinstance(token, BaseException):
+                raise token
+            yield _chunk(token)
+        yield _chunk(None, "stop")
+
+    async def close(self):
+        self.closed = True
+
+class FakeCompletions:
+    """Stand-in for client.chat.completions that replays scripted streams."""
+
+    def __init__(self):
+        self.responses = []
+        self.calls = []
+        self.streams = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, BaseException):
+            raise response
+        stream = FakeStream(response)
+        self.streams.append(stream)
+        return stream
+
+@pytest.fixture
+def completions(monkeypatch):
+    """Route every API call to a FakeCompletions instance."""
+    fake = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+    monkeypatch.setattr(character_generator, '_get_client', lambda *args: client)
+    return fake
+
+@pytest.fixture
+def generator(completions, monkeypatch):
+    """A CharacterGenerator with a dummy key and the completion cache disabled."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_CACHE", "false")
+    return CharacterGenerator()
+
+@pytest.mark.parametrize("model,json_mode", [
+    ("gpt-4", False),
+    ("gpt-4o", True),
+])
+def test_json_mode_only_for_supporting_models(generator, completions, model, json_mode):
+    """Test that response_format is only sent to models that accept JSON mode."""
+    generator.model = model
+    completions.responses.append([CHARACTER_SECTIONS])
+
+    generator.generate_character("Elf", "Fighter", "Neutral Good")
+    assert ("response_format" in completions.calls[0]) is json_mode
+
+def test_clients_are_per_event_loop():
+    """Test that each event loop gets its own API client, reused within that loop."""
+    async def get_client():
+        return character_generator._get_client("test-key")
+
+    assert asyncio.run(get_client()) is not asyncio.run(get_client())
+    assert character_generator._run(get_client()) is character_generator._run(get_client())
+
+def test_generate_across_event_loops(generator, completions):
+    """Test that one generator works from the sync wrapper and from separate asyncio.run calls."""
+    completions.responses.extend([CHARACTER_SECTIONS] for _ in range(3))
+
+    generator.generate_character("Elf", "Fighter", "Neutral Good")
+    for _ in range(2):
+        asyncio.run(generator.agenerate_character("Elf", "Fighter", "Neutral Good"))
+    assert len(completions.calls) == 3
+
+@pytest.mark.parametrize("temperature,cache_env,cached", [
+    ("0.7", None, False),
+    ("0", None, True),
+    ("0.7", "true", True),
+    ("0", "false", False),
+])
+def test_cache_defaults_to_deterministic_requests(monkeypatch, tmp_path, temperature, cache_env, cached):
+    """Test that sampled requests bypass the completion cache unless it is forced on."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_TEMPERATURE", temperature)
+    monkeypatch.setenv("OPENAI_CACHE_DIR", str(tmp_path))
+    if cache_env is None:
+        monkeypatch.delenv("OPENAI_CACHE", raising=False)
+    else:
+        monkeypatch.setenv("OPENAI_CACHE", cache_env)
+
+    assert (CharacterGenerator()._cache is not None) is cached
+
+def _connection_error():
+    """Build a transient API connection error."""
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Retry transient errors without waiting."""
+    monkeypatch.setattr(character_generator, '_backoff', lambda retry_state: 0)
+
+@pytest.mark.usefixtures("no_backoff")
+def test_stream_retried_before_first_token(generator, completions):
+    """Test that an error before any token is streamed is retried transparently."""
+    generator.model = "gpt-4o"
+    completions.responses.extend([_connection_error(), [_connection_error()], [CHARACTER_SECTIONS]])
+    tokens = []
+
+    generator.generate_character("Elf", "Fighter", "Neutral Good", on_token=tokens.append)
+    assert len(completions.calls) == 3
+    assert "".join(tokens) == CHARACTER_SECTIONS
+
+@pytest.mark.usefixtures("no_backoff")
+def test_stream_not_retried_after_tokens_echoed(generator, completions):
+    """Test that a stream failing after tokens reached on_token fails rather than echoing them twice."""
+    completions.responses.extend([['{"basic_info": ', _connection_error()], [CHARACTER_SECTIONS]])
+    tokens = []
+
+    with pytest.raises(CharacterGenerationError):
+        generator.generate_character("Elf", "Fighter", "Neutral Good", on_token=tokens.append)
+    assert len(completions.calls) == 1
+    assert "".join(tokens) == '{"basic_info": '
+    assert completions.streams[0].closed
+
+def test_stream_closed_when_on_token_raises(generator, completions):
+    """Test that the stream is closed when the token callback fails, e.g. on a broken pipe."""
+    completions.responses.append([CHARACTER_SECTIONS])
+
+    def on_token(token):
+        raise BrokenPipeError
+
+    with pytest.raises(CharacterGenerationError):
+        generator.generate_character("Elf", "Fighter", "Neutral Good", on_token=on_token)
+    assert completions.streams[0].closed
+
+@pytest.mark.usefixtures("no_backoff")
+def test_batch_retries_only_transient_failures(generator, completions):
+    """Test that generate_characters retries characters lost to transient errors, not permanent ones."""
+    generator.BATCH_RETRY_DELAY = 0
+    # The first spec exhausts the per-request retries, then succeeds on the batch retry
+    completions.responses.extend([_connection_error()] * 6 + [[CHARACTER_SECTIONS]])
+    assert generator.generate_characters([{"race": "Elf", "class_type": "Fighter", "alignment": "Neutral Good"}])
+    assert len(completions.calls) == 7
+
+    completions.calls.clear()
+    completions.responses.append(["not json"])
+    results = generator.generate_characters(
+        [{"race": "Elf", "class_type": "Fighter", "alignment": "Neutral Good"}], return_exceptions=True
+    )
+    assert isinstance(results[0], CharacterGenerationError)
+    assert len(completions.calls) == 1
+
+def test_batch_rejects_incomplete_spec(generator, completions):
+    """Test that a spec missing a required key is rejected before any API call."""
+    with pytest.raises(ValueError, match="class_type"):
+        generator.generate_characters([{"race": "Elf", "alignment": "Neutral Good"}])
+    assert not completions.calls
+
+def test_class_lookups_are_case_insensitive(generator, completions):
+    """Test that a lowercase class still gets its stat priorities and spells."""
+    completions.responses.append([CHARACTER_SECTIONS[:-1] + ', "spells": {}}'])
+
+    character = generator.generate_character("elf", "wizard", "neutral good")
+    assert character["stats"]["intelligence"] == max(character["stats"].values())
+    assert "spells" in character
+
+@pytest.mark.parametrize("text,expected_type,expected", [
+    ('{"name": "Aria"}', dict, {"name": "Aria"}),
+    ('Here is your character:\n{"name": "Aria"}\nEnjoy!', dict, {"name": "Aria"}),  # Prose preamble
+    ('```json\n{"name": "Aria"}\n```', dict, {"name": "Aria"}),  # Markdown fence
+    ('Per the rules [PHB p. 12]: {"name": "Aria"}', dict, {"name": "Aria"}),  # Bracket before the object
+    ('Use {name} as a placeholder: {"name": "Aria"}', dict, {"name": "Aria"}),  # Brace that doesn't decode
+    ('Equipment {for a wizard}:\n["Spellbook", "Quarterstaff"]', list, ["Spellbook", "Quarterstaff"]),
+])
+def test_loads_lenient(text, expected_type, expected):
+    """Test that JSON is recovered from the text surrounding it in a model response."""
+    assert _loads_lenient(text, expected_type) == expected
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+@pytest.mark.parametrize("text", ["No JSON here.", 'Almost: {"name": "Aria"'])
+def test_loads_lenient_without_json(text, backend, monkeypatch):
+    """Test that a response with no decodable JSON raises the error from parsing the whole text."""
+    monkeypatch.setattr(character_generator, '_json', pytest.importorskip(backend))
+
+    with pytest.raises(json.JSONDecodeError) as excinfo:
+        _loads_lenient(text)
+    assert excinfo.value.pos == 0
+
+def test_missing_sections_rejected(generator, completions):
+    """Test that a combined response lacking a requested section fails generation."""
+    completions.responses.append(['{"basic_info": {}, "equipment": []}'])
+
+    with pytest.raises(CharacterGenerationError, match="Response missing sections: background, features"):
+        generator.generate_character("Elf", "Fighter", "Neutral Good")
+
+def test_unparseable_completion_not_cached(generator, completions, tmp_path):
+    """Test that a reply that fails to parse is sampled again rather than replayed from the cache."""
+    generator._cache = CompletionCache(str(tmp_path))
+    completions.responses.extend([["Sorry, I can't help with that."], [CHARACTER_SECTIONS]])
+
+    with pytest.raises(CharacterGenerationError):
+        generator.generate_character("Elf", "Fighter", "Neutral Good")
+    generator.generate_character("Elf", "Fighter", "Neutral Good")
+    generator.generate_character("Elf", "Fighter", "Neutral Good")  # Served from the cache
+    assert len(completions.calls) == 2
+
+    # An entry that no longer parses is evicted and sampled again
+    (key,) = generator._cache._memory
+    generator._cache.set(key, "garbage")
+    completions.responses.append([CHARACTER_SECTIONS])
+    generator.generate_character("Elf", "Fighter", "Neutral Good")
+    assert len(completions.calls) == 3
+    assert generator._cache.get(key) == CHARACTER_SECTIONS
+
+def test_completion_cache_lru():
+    """Test hit and miss counts, and that the least recently used entry is evicted first."""
+    cache = CompletionCache(maxsize=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "b" is now least recently used
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    cache.delete("a")
+    assert cache.get("a") is None
+
+def test_completion_cache_persists(tmp_path):
+    """Test that completions written to disk are served by a new cache on the same directory."""
+    key = CompletionCache.make_key("gpt-4o", 2000, 0.0, [{"role": "user", "content": "Hi"}], {})
+    CompletionCache(str(tmp_path)).set(key, "Hello")
+
+    assert CompletionCache(str(tmp_path)).get(key) == "Hello"
+    assert key != CompletionCache.make_key("gpt-4o", 2000, 0.7, [{"role": "user", "content": "Hi"}], {})
+
+def test_roll_stats():
+    """Test that every rolled score is a valid 4d6-drop-lowest total."""
+    rolled = CharacterGenerator._roll_stats(100)
+
+    assert len(rolled) == 100
+    for stats in rolled:
+        assert tuple(stats) == CharacterGenerator.STAT_NAMES
+        assert all(3 <= value <= 18 for value in stats.values())
+
+@pytest.mark.parametrize("class_type,expected", [
+    ("Wizard", {"strength": 8, "dexterity": 13, "constitution": 14,
+                "intelligence": 15, "wisdom": 12, "charisma": 10}),
+    ("Unknown", {"strength": 15, "dexterity": 14, "constitution": 13,
+                 "intelligence": 12, "wisdom": 10, "charisma": 8}),  # Falls back to STAT_NAMES order
+])
+def test_optimize_stats_for_class(class_type, expected):
+    """Test that the highest scores go to the abilities the class relies on most."""
+    stats = dict(zip(CharacterGenerator.STAT_NAMES, (10, 15, 8, 13, 12, 14)))
+    assert CharacterGenerator._optimize_stats_for_class(stats, class_type) == expected
+
+def test_bulk_generate_stats(generator):
+    """Test that every bulk-generated stat block favours the class's primary ability."""
+    bulk = generator.bulk_generate_stats("Barbarian", 50)
+
+    assert len(bulk) == 50
+    assert all(stats["strength"] == max(stats.values()) for stats in bulk)
@@ -1,139 +1,256 @@
-import unittest
-from unittest.mock import patch
+"""Test suite for utility functions used in the D&D Character Creator."""
+
+import io
 import os
 import json
+from unittest.mock import patch
+
+import pytest
+from hypothesis import given, strategies as st
+
 from src.utils import (
     validate_input,
     sanitize_filename,
     load_character,
     save_character,
-    validate_character_data
+    validate_character_data,
+    write_json,
+    get_modifier,
+    get_modifiers,
+    _write_bytes,
+    _FILENAME_STRIP,
+    _RESERVED_FILENAMES
 )
 
-class TestUtils(unittest.TestCase):
-    """Test suite for utility functions used in the D&D Character Creator."""
-
-    def setUp(self):
-        """Set up test fixtures before each test method."""
-        self.valid_character = {
-            "name": "Test Character",
-            "race": "Elf",
-            "class": "Wizard",
-            "alignment": "Neutral Good",
-            "stats": {
-                "strength": 10,
-                "dexterity": 15,
-                "constitution": 12,
-                "intelligence": 16,
-                "wisdom": 13,
-                "charisma": 11
-            }
-        }
-        self.test_dir = "test_data"
-        os.makedirs(self.test_dir, exist_ok=True)
-
-    def tearDown(self):
-        """Clean up test fixtures after each test method."""
-        if os.path.exists(self.test_dir):
-            for file in os.listdir(self.test_dir):
-                os.remove(os.path.join(self.test_dir, file))
-            os.rmdir(self.test_dir)
-
-    def test_validate_input(self):
-        """Test input validation for character attributes."""
-        test_cases = [
-            # (input, valid_options, expected_result, should_raise)
-            ("Elf", ["Elf", "Human", "Dwarf"], True, False),
-            ("Elephant", ["Elf", "Human", "Dwarf"], False, False),
-            ("", ["Elf", "Human", "Dwarf"], False, True),
-            ("   Elf   ", ["Elf", "Human", "Dwarf"], True, False),  # Test whitespace
-            ("elf", ["Elf", "Human", "Dwarf"], True, False),  # Test case-insensitive
-        ]
-
-        for input_val, valid_options, expected, should_raise in test_cases:
-            if should_raise:
-                with self.assertRaises(ValueError):
-                    validate_input(input_val, valid_options)
-            else:
-                result = validate_input(input_val, valid_options)
-                self.assertEqual(result, expected)
-
-    def test_sanitize_filename(self):
-        """Test filename sanitization."""
-        test_cases = [
-            ("Test Character", "test_character"),
-            ("Test@#$%Character", "test_character"),
-            ("   Spaces   ", "spaces"),
-            ("../path/traversal", "path_traversal"),
-            ("Com1", "character"),  # Windows reserved name
-            ("", "character"),  # Empty string
-        ]
-
-        for input_name, expected in test_cases:
-            result = sanitize_filename(input_name)
-            self.assertEqual(result, expected)
-            self.assertTrue(result.isalnum() or '_' in result)
-
-    def test_save_and_load_character(self):
-        """Test character saving and loading functionality."""
-        filename = os.path.join(self.test_dir, "test_character.json")
-        
-        # Test saving
-        save_character(self.valid_character, filename)
-        self.assertTrue(os.path.exists(filename))
-        
-        # Test loading
-        loaded_character = load_character(filename)
-        self.assertEqual(loaded_character, self.valid_character)
-        
-        # Test loading non-existent file
-        with self.assertRaises(FileNotFoundError):
-            load_character("nonexistent.json")
-
-    def test_validate_character_data(self):
-        """Test character data validation."""
-        # Test valid character
-        self.assertTrue(validate_character_data(self.valid_character))
-        
-        # Test missing required fields
-        invalid_characters = [
-            {},  # Empty dictionary
-            {"name": "Test"},  # Missing required fields
-            {**self.valid_character, "stats": None},  # Invalid stats
-            {**self.valid_character, "alignment": "Invalid"},  # Invalid alignment
-        ]
-        
-        for invalid_char in invalid_characters:
-            with self.assertRaises(ValueError):
-                validate_character_data(invalid_char)
-
-    @patch('src.utils.validate_input')
-    def test_input_validation_integration(self, mock_validate):
-        """Test integration with input validation."""
+VALID_CHARACTER = {
+    "name": "Test Character",
+    "race": "Elf",
+    "class": "Wizard",
+    "alignment": "Neutral Good",
+    "stats": {
+        "strength": 10,
+        "dexterity": 15,
+        "constitution": 12,
+        "intelligence": 16,
+        "wisdom": 13,
+        "charisma": 11
+    },
+    "background": "Test background"
+}
+
+# VALID_CHARACTER as save_character writes it: indented UTF-8 JSON
+_VALID_CHARACTER_BYTES = json.dumps(VALID_CHARACTER, indent=2, ensure_ascii=False).encode('utf-8')
+
+INVALID_CHARACTERS = [
+    {},  # Empty dictionary
+    {"name": "Test"},  # Missing required fields
+    {**VALID_CHARACTER, "stats": None},  # Invalid stats
+    {**VALID_CHARACTER, "alignment": "Invalid"},  # Invalid alignment
+]
+
+@pytest.fixture(scope="session")
+def valid_character():
+    """Character data shared by every test; tests must not modify it."""
+    return VALID_CHARACTER
+
+@pytest.fixture(scope="session")
+def _valid_character_is_valid(valid_character):
+    """Validate the shared character once per session."""
+    assert validate_character_data(valid_character) is True
+
+@pytest.fixture(scope="session")
+def valid_character_subset():
+    """Basic character information without stats or background."""
+    return {
+        "name": "Test Character",
+        "race": "Elf",
+        "class": "Wizard",
+        "alignment": "Neutral Good"
+    }
+
+@pytest.fixture
+def mock_validate_input():
+    """Patch src.utils.validate_input to accept every value."""
+    with patch('src.utils.validate_input') as mock_validate:
         mock_validate.return_value = True
-        
-        # Test character creation with mocked validation
-        test_data = {
-            "name": "Test Character",
-            "race": "Elf",
-            "class": "Wizard",
-            "alignment": "Neutral Good"
-        }
-        
-        self.assertTrue(validate_character_data(test_data))
-        mock_validate.assert_called()
-
-    def test_error_handling(self):
-        """Test error handling in utility functions."""
-        # Test file permission error
-        with patch('builtins.open', side_effect=PermissionError):
-            with self.assertRaises(PermissionError):
-                save_character(self.valid_character, "test.json")
-
-        # Test JSON decode error
-        with patch('json.loads', side_effect=json.JSONDecodeError("Test error", "", 0)):
-            with self.assertRaises(ValueError):
-                load_character("test.json")
-
-if __name__ == '__main__':
-    unittest.main(verbosity=2)
\ No newline at end of file
+        yield mock_validate
+
+@pytest.mark.parametrize("input_val,valid_options,expected,should_raise", [
+    ("Elf", ["Elf", "Human", "Dwarf"], True, False),
+    ("Elephant", ["Elf", "Human", "Dwarf"], False, False),
+    ("", ["Elf", "Human", "Dwarf"], False, True),
+    ("   Elf   ", ["Elf", "Human", "Dwarf"], True, False),  # Test whitespace
+    ("elf", ["Elf", "Human", "Dwarf"], True, False),  # Test case-insensitive
+])
+def test_validate_input(input_val, valid_options, expected, should_raise):
+    """Test input validation for character attributes."""
+    if should_raise:
+        with pytest.raises(ValueError):
+            validate_input(input_val, valid_options)
+    else:
+        result = validate_input(input_val, valid_options)
+        assert result == expected
+
+def test_validate_input_cached():
+    """Test that repeating a validation is served from the cache."""
+    valid_options = ("Elf", "Human", "Dwarf")
+    validate_input.cache_clear()
+
+    assert validate_input("Elf", valid_options)
+    assert validate_input("Elf", valid_options)
+    assert validate_input.cache_info().hits == 1
+
+@pytest.mark.parametrize("input_name,expected", [
+    ("Test Character", "test_character"),
+    ("Test@#$%Character", "test_character"),
+    ("   Spaces   ", "spaces"),
+    ("../path/traversal", "path_traversal"),
+    ("Com1", "character"),  # Windows reserved name
+    ("", "character"),  # Empty string
+])
+def test_sanitize_filename(input_name, expected):
+    """Test filename sanitization."""
+    result = sanitize_filename(input_name)
+    assert result == expected
+
+@given(st.text())
+def test_sanitize_filename_invariant(filename):
+    """Test that any input sanitizes to a non-empty, safe, non-reserved filename."""
+    result = sanitize_filename(filename)
+    assert result
+    assert not set(result) & set('<>:"/\\|?* ')
+    assert result not in _RESERVED_FILENAMES
+
+def test_sanitize_filename_tables_precomputed(monkeypatch):
+    """Test that sanitize_filename uses the module's prebuilt tables rather than building its own per call."""
+    monkeypatch.setattr('src.utils._FILENAME_STRIP', {**_FILENAME_STRIP, ord('x'): None})
+    monkeypatch.setattr('src.utils._RESERVED_FILENAMES', frozenset({'hero'}))
+
+    assert sanitize_filename("Maxim") == "maim"
+    assert sanitize_filename("Hero").startswith("character_")
+
+@pytest.mark.xdist_group("utils_fs")
+@pytest.mark.usefixtures("_valid_character_is_valid")
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_save_character(backend, valid_character, tmp_path, monkeypatch):
+    """Test that saving writes the expected bytes, captured in memory."""
+    monkeypatch.setattr('src.utils._json', pytest.importorskip(backend))
+    files = {}
+
+    def fake_write_bytes(filepath, payload):
+        files[str(filepath)] = payload
+
+    monkeypatch.setattr('src.utils._write_bytes', fake_write_bytes)
+    filename = tmp_path / "test_character.json"
+
+    save_character(valid_character, filename)
+    assert files[str(filename)] == _VALID_CHARACTER_BYTES
+
+@pytest.mark.xdist_group("utils_fs")
+def test_save_character_recreates_removed_directory(valid_character, tmp_path):
+    """Test that saving still works after a directory created earlier in the process is removed."""
+    filepath = tmp_path / "characters" / "test_character.json"
+    save_character(valid_character, filepath)
+    filepath.unlink()
+    filepath.parent.rmdir()
+
+    save_character(valid_character, filepath)
+    assert filepath.read_bytes() == _VALID_CHARACTER_BYTES
+
+@pytest.mark.xdist_group("utils_fs")
+def test_write_json(valid_character, tmp_path):
+    """Test that write_json writes indented UTF-8 JSON and returns the path."""
+    filepath = tmp_path / "test_character.json"
+
+    assert write_json(filepath, valid_character) == str(filepath)
+    assert filepath.read_bytes() == _VALID_CHARACTER_BYTES
+
+@pytest.mark.xdist_group("utils_fs")
+def test_write_never_ensured_directory(tmp_path):
+    """Test that writing under a missing directory that was never ensured still fails."""
+    filepath = tmp_path / "never" / "existed" / "test_character.json"
+
+    with pytest.raises(FileNotFoundError):
+        _write_bytes(filepath, b"{}")
+    assert not (tmp_path / "never").exists()
+
+@pytest.mark.xdist_group("utils_fs")
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_load_character(backend, valid_character, monkeypatch):
+    """Test that loading parses saved bytes back into the original character."""
+    monkeypatch.setattr('src.utils._json', pytest.importorskip(backend))
+    monkeypatch.setattr('src.utils.open', lambda *args, **kwargs: io.BytesIO(_VALID_CHARACTER_BYTES),
+                        raising=False)
+
+    assert load_character("test_character.json") == valid_character
+
+@pytest.mark.xdist_group("utils_fs")
+def test_load_nonexistent_character():
+    """Test loading a file that does not exist on the real filesystem."""
+    with pytest.raises(FileNotFoundError):
+        load_character("nonexistent.json")
+
+@pytest.mark.usefixtures("_valid_character_is_valid")
+def test_validate_character_data():
+    """Test character data validation."""
+    # The valid character is checked once per session by _valid_character_is_valid;
+    # test missing required fields
+    for invalid_char in INVALID_CHARACTERS:
+        with pytest.raises(ValueError):
+            validate_character_data(invalid_char)
+
+@pytest.mark.parametrize("score,expected", [
+    (10, 0),
+    (11, 0),
+    (9, -1),
+    (1, -5),
+    (20, 5),
+    (15.0, 2),  # Whole-number float, as loaded from some files
+    (9.5, -1),  # Fractional floats floor like (score - 10) // 2
+])
+def test_get_modifier(score, expected):
+    """Test ability modifier calculation, including odd and low scores."""
+    assert get_modifier(score) == expected
+
+@pytest.mark.parametrize("score", ["15", None])
+def test_get_modifier_rejects_non_numbers(score):
+    """Test that non-numeric scores raise rather than being coerced."""
+    with pytest.raises(TypeError):
+        get_modifier(score)
+    with pytest.raises(TypeError):
+        get_modifiers({"strength": score})
+
+def test_get_modifiers(valid_character):
+    """Test that get_modifiers matches get_modifier for every stat."""
+    stats = valid_character["stats"]
+    assert get_modifiers(stats) == {stat: get_modifier(value) for stat, value in stats.items()}
+    assert get_modifiers({"strength": 8, "dexterity": 15.0}) == {"strength": -1, "dexterity": 2}
+
+def test_input_validation_integration(mock_validate_input, valid_character_subset):
+    """Test integration with input validation."""
+    # Test character creation with mocked validation
+    assert validate_character_data(valid_character_subset)
+    mock_validate_input.assert_called()
+
+@pytest.mark.xdist_group("utils_fs")
+def test_error_handling(valid_character, tmp_path):
+    """Test error handling in utility functions."""
+    # Test file permission error
+    with patch.object(os, 'open', side_effect=PermissionError):
+        with pytest.raises(PermissionError):
+            save_character(valid_character, "test.json")
+
+    # Test JSON decode error, raised by the real parser on a malformed file
+    bad_file = tmp_path / "bad.json"
+    bad_file.write_bytes(b"{")
+    with pytest.raises(ValueError):
+        load_character(str(bad_file))
+
+@pytest.mark.xdist_group("utils_fs")
+@pytest.mark.benchmark(group="utils-json", min_rounds=100)
+def test_save_load_bench(benchmark, tmp_path, valid_character):
+    """Benchmark the save/load round-trip to guard against JSON-path regressions."""
+    filepath = str(tmp_path / "c.json")
+
+    result = benchmark(lambda: (save_character(valid_character, filepath), load_character(filepath)))
+    assert result[1] == valid_character